@@ -1,4 +1,5 @@
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
@@ -7,6 +8,8 @@ import io
 from typing import List, Dict, Tuple, Optional
 import numpy as np
 import os
+import hashlib
+import tempfile
 
 # Configure page
 st.set_page_config(
@@ -16,7 +19,7 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Intro description
+# Intro description and custom CSS, sent as a single element
 st.markdown("""
 # 🌍 Country-Specific Automation Probability Dashboard
 
@@ -49,18 +52,8 @@ This platform provides an interactive way to explore **real diffusion probabilit
 - **Export data** for further research
 
 ---
-""")
 
-# Custom CSS for better styling
-st.markdown("""
 <style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-        font-weight: bold;
-    }
     .sub-header {
         font-size: 1.5rem;
         color: #ff7f0e;
@@ -74,31 +67,6 @@ st.markdown("""
         margin: 0.5rem 0;
         text-align: center;
     }
-    .occupation-card {
-        background-color: #ffffff;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border: 1px solid #e1e5e9;
-        margin: 0.5rem 0;
-        transition: all 0.3s ease;
-    }
-    .occupation-card:hover {
-        border-color: #1f77b4;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        transform: translateY(-2px);
-    }
-    .selected-occupation {
-        border-color: #1f77b4;
-        background-color: #f0f8ff;
-        box-shadow: 0 2px 8px rgba(31,119,180,0.2);
-    }
-    .metric-container {
-        background-color: #f8f9fa;
-        border-radius: 10px;
-        padding: 1rem;
-        border-left: 4px solid #1f77b4;
-        margin: 0.5rem 0;
-    }
     .country-flag {
         font-size: 1.5rem;
         margin-right: 0.5rem;
@@ -152,30 +120,102 @@ COUNTRIES = {
     }
 }
 
-@st.cache_data
+# Probability columns follow the SOC code and title columns, one per year from 2017 to 2107
+YEARS = np.arange(2017, 2108, dtype=np.int32)
+PROB_START_COL = 2
+IDX_2024, IDX_2030, IDX_2050 = 7, 13, 33
+
+CACHE_DIR = '.cache'
+
+def _read_excel_cached(cache_key: str, source) -> pd.DataFrame:
+    """Read an Excel source, reusing a parquet snapshot stored under cache_key"""
+    cache_file = os.path.join(CACHE_DIR, f"{hashlib.md5(cache_key.encode()).hexdigest()}.parquet")
+    
+    if os.path.exists(cache_file):
+        try:
+            snapshot = pd.read_parquet(cache_file)
+            columns = snapshot.attrs.pop('columns', None)
+            if columns is not None and len(columns) == snapshot.shape[1]:
+                return snapshot.set_axis(columns, axis=1)
+        except Exception:
+            pass  # Corrupt or incompatible snapshot, parse the Excel file again
+    
+    df = pd.read_excel(source, engine="calamine")
+    
+    tmp_file = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Parquet requires string column names, the original headers (with their types)
+        # travel in the snapshot's attrs, which pandas stores in the parquet metadata
+        snapshot = df.set_axis(df.columns.map(str), axis=1)
+        snapshot.attrs['columns'] = list(df.columns)
+        # Write next to the target and rename, so readers never see a partial snapshot
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix='.tmp', delete=False) as tmp:
+            tmp_file = tmp.name
+        snapshot.to_parquet(tmp_file, compression="zstd")
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        # Caching is best effort, e.g. on a read-only filesystem or unusual header types
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    
+    return df
+
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce probability columns to float32 once so plots and stats can use them as-is
+    
+    Builds a new frame: the parsed frame is kept unchanged for exports.
+    """
+    # SOC codes and titles are compared and filtered often, category turns == into int code compares
+    text = df.iloc[:, :PROB_START_COL].astype('category')
+    # Probabilities stay one contiguous numpy float32 block
+    probs = df.iloc[:, PROB_START_COL:].apply(pd.to_numeric, errors='coerce').astype(np.float32).fillna(0.0)
+    return pd.concat([text, probs], axis=1)
+
+def _load_cached(path: str) -> pd.DataFrame:
+    """Load an Excel file from disk, keyed by its path, mtime and size"""
+    cache_key = f"{os.path.abspath(path)}:{os.path.getmtime(path)}:{os.path.getsize(path)}"
+    return _read_excel_cached(cache_key, path)
+
+@st.cache_resource
 def load_country_data():
-    """Load automation data for all countries"""
+    """Load automation data for all countries
+    
+    Returns the prepared frames used for analysis, the frames as parsed from the files
+    (used for exports) and the missing files. The result is shared by every session
+    without copying, so callers must not mutate it.
+    """
     country_data = {}
+    source_data = {}
     missing_files = []
     
     for country_code, country_info in COUNTRIES.items():
         try:
             # Try to load the file
             if os.path.exists(country_info['file']):
-                df = pd.read_excel(country_info['file'])
-                country_data[country_code] = df
+                source_df = _load_cached(country_info['file'])
+                country_data[country_code] = _prepare_frame(source_df)
+                source_data[country_code] = source_df
             else:
                 missing_files.append(country_info['file'])
         except Exception as e:
             st.error(f"Error loading {country_info['file']}: {str(e)}")
             missing_files.append(country_info['file'])
     
-    return country_data, missing_files
+    return country_data, source_data, missing_files
 
-@st.cache_data
+def _upload_digest(uploaded_file: UploadedFile) -> str:
+    """Content hash of an uploaded file"""
+    return hashlib.md5(uploaded_file.getvalue()).hexdigest()
+
+@st.cache_data(hash_funcs={UploadedFile: _upload_digest})
 def load_uploaded_data(uploaded_files):
-    """Load data from uploaded files"""
+    """Load data from uploaded files, identical uploads are only parsed once
+    
+    Returns the prepared frames and the frames as parsed, like load_country_data.
+    """
     country_data = {}
+    source_data = {}
     
     for uploaded_file in uploaded_files:
         # Match filename to country
@@ -189,46 +229,157 @@ def load_uploaded_data(uploaded_files):
         
         if country_code:
             try:
-                df = pd.read_excel(uploaded_file)
-                country_data[country_code] = df
+                # No disk snapshot for uploads: the cache_data entry covers reruns and
+                # per-upload files would never be evicted
+                source_df = pd.read_excel(io.BytesIO(uploaded_file.getvalue()), engine="calamine")
+                country_data[country_code] = _prepare_frame(source_df)
+                source_data[country_code] = source_df
             except Exception as e:
                 st.error(f"Error loading {filename}: {str(e)}")
     
-    return country_data
+    return country_data, source_data
+
+def build_search_columns(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """Lowercased SOC code and title columns used by search_occupations"""
+    return df.iloc[:, 0].astype(str).str.lower(), df.iloc[:, 1].astype(str).str.lower()
 
-def search_occupations(data: pd.DataFrame, search_term: str) -> pd.DataFrame:
+def search_occupations(data: pd.DataFrame, search_term: str,
+                       search_columns: Optional[Tuple[pd.Series, pd.Series]] = None) -> pd.DataFrame:
     """Search occupations by SOC code or title"""
     if not search_term:
         return data
     
+    if search_columns is None:
+        search_columns = build_search_columns(data)
+    soc_lower, title_lower = search_columns
+    
     search_term = search_term.lower()
-    soc_matches = data.iloc[:, 0].astype(str).str.lower().str.contains(search_term, na=False)
-    title_matches = data.iloc[:, 1].astype(str).str.lower().str.contains(search_term, na=False)
+    soc_matches = soc_lower.str.contains(search_term, regex=False, na=False)
+    title_matches = title_lower.str.contains(search_term, regex=False, na=False)
     
     return data[soc_matches | title_matches]
 
-def calculate_country_occupation_stats(occupation_title: str, country_data: Dict) -> Dict:
-    """Calculate basic statistics for an occupation across countries"""
-    years = list(range(2017, 2108))  # 2017-2107
+def build_title_index(df: pd.DataFrame) -> Tuple[pd.Index, pd.Index]:
+    """Occupation titles of a country as an Index, with a lowercased twin for filtering"""
+    title_index = pd.Index(df.iloc[:, 1].astype(str))
+    return title_index, title_index.str.lower()
+
+def filter_occupation_titles(title_index: pd.Index, lower_index: pd.Index, search_term: str) -> List[str]:
+    """Occupation titles containing the search term, case-insensitive"""
+    if not search_term:
+        return title_index.tolist()
+    
+    mask = lower_index.str.contains(search_term.lower(), regex=False, na=False)
+    return title_index[mask].tolist()
+
+@st.cache_data
+def build_probability_tensor(country_data: Dict) -> Dict:
+    """Gather all probabilities into one (countries, occupations, years) float32 array
+    
+    Occupations are the union of titles across countries; 'present' marks which
+    (country, occupation) cells hold data, the others are NaN.
+    """
+    codes = list(country_data.keys())
+    country_titles = [df.iloc[:, 1].astype(str) for df in country_data.values()]
+    titles = pd.Index(pd.concat(country_titles, ignore_index=True).unique()) if codes else pd.Index([])
+    n_years = max((df.shape[1] - PROB_START_COL for df in country_data.values()), default=0)
+    
+    probs = np.full((len(codes), len(titles), n_years), np.nan, dtype=np.float32)
+    present = np.zeros((len(codes), len(titles)), dtype=bool)
+    
+    for i, (df, occ_titles) in enumerate(zip(country_data.values(), country_titles)):
+        # Keep the first row for duplicated titles, like a boolean mask lookup would
+        first = ~occ_titles.duplicated().to_numpy()
+        rows = titles.get_indexer(occ_titles[first])
+        values = df.iloc[:, PROB_START_COL:].to_numpy(dtype=np.float32)[first]
+        probs[i, rows, :values.shape[1]] = values
+        present[i, rows] = True
+    
+    # Content fingerprint, lets cached plot builders key on the data without rehashing it
+    data_key = hashlib.md5(probs.tobytes() + present.tobytes() + '\n'.join(codes + titles.tolist()).encode()).hexdigest()
+    
+    return {
+        'data_key': data_key,
+        'codes': codes,
+        'titles': titles.to_numpy(dtype=object),
+        'title_to_row': {title: row for row, title in enumerate(titles)},
+        'probs': probs,
+        'present': present,
+    }
+
+def lookup_occupations(prob_lookup: Dict, country_code: str, occupation_titles: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Return the titles available in a country and their (occupations, years) probabilities"""
+    country_idx = prob_lookup['codes'].index(country_code)
+    title_to_row = prob_lookup['title_to_row']
+    
+    found = [title for title in occupation_titles
+             if title in title_to_row and prob_lookup['present'][country_idx, title_to_row[title]]]
+    rows = [title_to_row[title] for title in found]
+    
+    return found, prob_lookup['probs'][country_idx, rows]
+
+def build_title_sets(prob_lookup: Dict) -> Dict[str, frozenset]:
+    """Collect the occupation titles available in each country"""
+    return {
+        country_code: frozenset(prob_lookup['titles'][prob_lookup['present'][i]])
+        for i, country_code in enumerate(prob_lookup['codes'])
+    }
+
+def common_titles(title_sets: Dict[str, frozenset], country_codes: List[str]) -> List[str]:
+    """Sorted occupation titles shared by all the given countries"""
+    sets = [title_sets[code] for code in country_codes if code in title_sets]
+    return sorted(frozenset.intersection(*sets)) if sets else []
+
+def init_lookup_state(country_data: Dict, source_key: str):
+    """Build lookup structures once per data source and keep them in session state
+    
+    source_key identifies where country_data came from (country codes plus upload
+    digests), so re-uploading a different file for the same country rebuilds everything.
+    """
+    if st.session_state.get('lookup_source_key') != source_key:
+        prob_lookup = build_probability_tensor(country_data)
+        st.session_state.lookup_source_key = source_key
+        st.session_state.prob_lookup = prob_lookup
+        st.session_state.title_sets = build_title_sets(prob_lookup)
+        st.session_state.search_columns = {
+            country_code: build_search_columns(df) for country_code, df in country_data.items()
+        }
+        st.session_state.title_indexes = {
+            country_code: build_title_index(df) for country_code, df in country_data.items()
+        }
+        st.session_state.common_title_indexes = {}
+        st.session_state.overview_stats = create_country_overview_metrics(prob_lookup)
+        # Results computed from the previous data are no longer valid
+        st.session_state.pop('multi_analysis', None)
+        for key in [key for key in st.session_state if key.startswith(('export_csv_', 'export_excel_'))]:
+            del st.session_state[key]
+
+def calculate_country_occupation_stats(occupation_title: str, prob_lookup: Dict,
+                                       country_codes: Optional[List[str]] = None) -> Dict:
+    """Calculate basic statistics for an occupation across countries (all countries by default)"""
     stats = {}
+    row = prob_lookup['title_to_row'].get(occupation_title)
+    
+    if row is None:
+        return stats
     
-    for country_code, df in country_data.items():
-        # Find the occupation
-        occ_row = df[df.iloc[:, 1] == occupation_title]
+    for i, country_code in enumerate(prob_lookup['codes']):
+        if country_codes is not None and country_code not in country_codes:
+            continue
         
-        if not occ_row.empty:
-            # Get probability values (skip SOC code and title columns)
-            probs = occ_row.iloc[0, 2:].values
+        if prob_lookup['present'][i, row]:
+            # Contiguous row of yearly probabilities
+            probs = prob_lookup['probs'][i, row]
             
             # Calculate basic statistics
-            current_prob = probs[7] if len(probs) > 7 else 0  # 2024 index
-            prob_2030 = probs[13] if len(probs) > 13 else 0   # 2030 index
-            prob_2050 = probs[33] if len(probs) > 33 else 0   # 2050 index
+            current_prob = probs[IDX_2024] if len(probs) > IDX_2024 else 0
+            prob_2030 = probs[IDX_2030] if len(probs) > IDX_2030 else 0
+            prob_2050 = probs[IDX_2050] if len(probs) > IDX_2050 else 0
             final_prob = probs[-1] if len(probs) > 0 else 0   # 2107
             
             stats[country_code] = {
                 'probabilities': probs,
-                'years': years[:len(probs)],
+                'years': YEARS[:len(probs)],
                 'current_2024': current_prob,
                 'outlook_2030': prob_2030,
                 'midterm_2050': prob_2050,
@@ -237,18 +388,31 @@ def calculate_country_occupation_stats(occupation_title: str, country_data: Dict
     
     return stats
 
-def create_country_comparison_plot(occupation_title: str, country_data: Dict, selected_countries: List[str]):
+def classify_risk(probs: np.ndarray, suffix: str = "") -> np.ndarray:
+    """Bucket 2024 automation probabilities into risk levels"""
+    return np.select(
+        [probs > 0.5, probs > 0.2],
+        [f"🔴 High{suffix}", f"🟡 Medium{suffix}"],
+        f"🟢 Low{suffix}"
+    )
+
+def _lookup_key(prob_lookup: Dict) -> str:
+    """Cache key for the probability lookup"""
+    return prob_lookup['data_key']
+
+@st.cache_resource(hash_funcs={dict: _lookup_key}, show_spinner=False)
+def create_country_comparison_plot(occupation_title: str, prob_lookup: Dict, selected_countries: List[str]) -> go.Figure:
     """Create comparison plot for an occupation across selected countries"""
     fig = go.Figure()
     
-    stats = calculate_country_occupation_stats(occupation_title, country_data)
+    stats = calculate_country_occupation_stats(occupation_title, prob_lookup, selected_countries)
     
     for country_code in selected_countries:
         if country_code in stats:
             country_info = COUNTRIES[country_code]
             country_stats = stats[country_code]
             
-            fig.add_trace(go.Scatter(
+            fig.add_trace(go.Scattergl(
                 x=country_stats['years'],
                 y=country_stats['probabilities'],
                 mode='lines+markers',
@@ -280,28 +444,24 @@ def create_country_comparison_plot(occupation_title: str, country_data: Dict, se
     
     return fig
 
-def create_multi_occupation_plot(selected_occupations: List[str], country_code: str, country_data: Dict):
+@st.cache_resource(hash_funcs={dict: _lookup_key}, show_spinner=False)
+def create_multi_occupation_plot(selected_occupations: List[str], country_code: str, prob_lookup: Dict) -> Optional[go.Figure]:
     """Create plot comparing multiple occupations within a single country"""
-    if country_code not in country_data:
+    if country_code not in prob_lookup['codes']:
         return None
     
     fig = go.Figure()
-    df = country_data[country_code]
     colors = px.colors.qualitative.Set3
+    found, occ_probs = lookup_occupations(prob_lookup, country_code, selected_occupations)
+    occ_probs = dict(zip(found, occ_probs))
     
     for i, occ_title in enumerate(selected_occupations):
-        # Find occupation with string conversion
-        occ_row = df[df.iloc[:, 1].astype(str) == str(occ_title)]
-        
-        if not occ_row.empty:
-            probs = occ_row.iloc[0, 2:].values
-            # Convert to numeric and handle any non-numeric values - FIXED
-            probs = pd.to_numeric(probs, errors='coerce')
-            probs = np.nan_to_num(probs, nan=0)  # Replace NaN with 0
-            years = list(range(2017, 2017 + len(probs)))
+        if occ_title in occ_probs:
+            probs = occ_probs[occ_title]
+            years = YEARS[:len(probs)]
             color = colors[i % len(colors)]
             
-            fig.add_trace(go.Scatter(
+            fig.add_trace(go.Scattergl(
                 x=years,
                 y=probs,
                 mode='lines+markers',
@@ -333,6 +493,38 @@ def create_multi_occupation_plot(selected_occupations: List[str], country_code:
     
     return fig
 
+@st.cache_resource(hash_funcs={dict: _lookup_key}, show_spinner=False)
+def create_single_occupation_plot(occupation_title: str, country_code: str, prob_lookup: Dict) -> Optional[go.Figure]:
+    """Create filled trend plot for one occupation in one country"""
+    stats = calculate_country_occupation_stats(occupation_title, prob_lookup, [country_code])
+    
+    if country_code not in stats:
+        return None
+    
+    country_info = COUNTRIES[country_code]
+    country_stats = stats[country_code]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=country_stats['years'],
+        y=country_stats['probabilities'],
+        mode='lines+markers',
+        name=f"{country_info['flag']} {country_info['name']}",
+        line=dict(color=country_info['color'], width=4),
+        marker=dict(size=8),
+        fill='tonexty'
+    ))
+    
+    fig.update_layout(
+        title=f"Automation Probability: {occupation_title}",
+        xaxis_title="Year",
+        yaxis_title="Automation Probability",
+        height=400
+    )
+    
+    return fig
+
+@st.cache_data(show_spinner=False)
 def export_data(data: pd.DataFrame, filename: str, file_format: str):
     """Export data to CSV or Excel format"""
     buffer = io.BytesIO()
@@ -341,39 +533,86 @@ def export_data(data: pd.DataFrame, filename: str, file_format: str):
         csv_data = data.to_csv(index=False)
         return csv_data.encode('utf-8'), f"{filename}.csv", "text/csv"
     else:
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        # No constant_memory: pandas writes column by column, which that mode would truncate
+        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
             data.to_excel(writer, sheet_name='Data', index=False)
         return buffer.getvalue(), f"{filename}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-def create_country_overview_metrics(country_data: Dict):
+# Numeric reductions over the (countries, occupations, years) probability tensor. Cells
+# missing for a country are NaN, so fastmath is left off: it would let Numba assume NaN never occurs.
+def _country_means_loop(probs: np.ndarray, year_idx: int) -> np.ndarray:
+    """Mean probability per country for one year, ignoring NaN cells"""
+    out = np.full(probs.shape[0], np.nan)
+    for i in range(probs.shape[0]):
+        total = 0.0
+        count = 0
+        for j in range(probs.shape[1]):
+            value = probs[i, j, year_idx]
+            if not np.isnan(value):
+                total += value
+                count += 1
+        if count > 0:
+            out[i] = total / count
+    return out
+
+def _high_risk_counts_loop(probs: np.ndarray, year_idx: int, threshold: float) -> np.ndarray:
+    """Number of occupations per country above threshold for one year"""
+    out = np.zeros(probs.shape[0], np.int64)
+    for i in range(probs.shape[0]):
+        for j in range(probs.shape[1]):
+            if probs[i, j, year_idx] > threshold:
+                out[i] += 1
+    return out
+
+# NumPy equivalents of the loops above, used when Numba is not installed
+def _country_means_numpy(probs: np.ndarray, year_idx: int) -> np.ndarray:
+    return np.nanmean(probs[:, :, year_idx], axis=1)
+
+def _high_risk_counts_numpy(probs: np.ndarray, year_idx: int, threshold: float) -> np.ndarray:
+    return (probs[:, :, year_idx] > threshold).sum(axis=1)
+
+@st.cache_resource(show_spinner=False)
+def _overview_kernels():
+    """Mean and threshold-count kernels, compiled with Numba on first use when it is installed"""
+    try:
+        from numba import njit
+    except ImportError:  # Numba is optional, the NumPy versions give the same results
+        return _country_means_numpy, _high_risk_counts_numpy
+    
+    return njit(cache=True)(_country_means_loop), njit(cache=True)(_high_risk_counts_loop)
+
+def create_country_overview_metrics(prob_lookup: Dict):
     """Create overview metrics for all countries"""
+    probs = prob_lookup['probs']
     overview_stats = {}
     
-    for country_code, df in country_data.items():
-        # Calculate aggregate statistics
-        total_occupations = len(df)
-        
-        # Average automation probability in 2024 (index 7)
-        avg_2024 = df.iloc[:, 9].mean() if len(df.columns) > 9 else 0  # Column index 9 = 2024
-        
-        # Occupations with >50% probability by 2050 (index 33)
-        if len(df.columns) > 35:
-            high_risk_2050 = (df.iloc[:, 35] > 0.5).sum()  # Column index 35 = 2050
-        else:
-            high_risk_2050 = 0
-        
+    if probs.shape[2] <= IDX_2050:
+        return overview_stats
+    
+    country_means, high_risk_counts = _overview_kernels()
+    
+    # Cells missing for a country are NaN, so they are skipped by the mean and never exceed the threshold
+    total_occupations = prob_lookup['present'].sum(axis=1)
+    avg_2024 = country_means(probs, IDX_2024)
+    high_risk_2050 = high_risk_counts(probs, IDX_2050, 0.5)
+    
+    for i, country_code in enumerate(prob_lookup['codes']):
         overview_stats[country_code] = {
-            'total_occupations': total_occupations,
-            'avg_automation_2024': avg_2024,
-            'high_risk_occupations_2050': high_risk_2050,
-            'high_risk_percentage': (high_risk_2050 / total_occupations * 100) if total_occupations > 0 else 0
+            'total_occupations': int(total_occupations[i]),
+            'avg_automation_2024': float(avg_2024[i]),
+            'high_risk_occupations_2050': int(high_risk_2050[i]),
+            'high_risk_percentage': (high_risk_2050[i] / total_occupations[i] * 100) if total_occupations[i] > 0 else 0
         }
     
     return overview_stats
 
 def main():
     # Load data
-    country_data, missing_files = load_country_data()
+    country_data, source_data, missing_files = load_country_data()
+    # Uploads are added below, keep the shared dicts intact
+    country_data = dict(country_data)
+    source_data = dict(source_data)
+    data_sources = list(country_data.keys())
     
     # If files are missing, show upload option
     if missing_files:
@@ -388,8 +627,10 @@ def main():
         )
         
         if uploaded_files:
-            uploaded_data = load_uploaded_data(uploaded_files)
+            uploaded_data, uploaded_source_data = load_uploaded_data(uploaded_files)
             country_data.update(uploaded_data)
+            source_data.update(uploaded_source_data)
+            data_sources += list(uploaded_data.keys()) + [_upload_digest(f) for f in uploaded_files]
             
             if country_data:
                 st.success(f"✅ Loaded data for {len(country_data)} countries")
@@ -402,11 +643,13 @@ def main():
     else:
         st.success(f"✅ Successfully loaded data for {len(country_data)} countries")
     
+    init_lookup_state(country_data, '|'.join(data_sources))
+    prob_lookup = st.session_state.prob_lookup
+    title_sets = st.session_state.title_sets
+    
     # Initialize session state
     if 'selected_occupations' not in st.session_state:
         st.session_state.selected_occupations = []
-    if 'selected_countries' not in st.session_state:
-        st.session_state.selected_countries = list(country_data.keys())
     
     # Sidebar with country overview
     with st.sidebar:
@@ -416,20 +659,24 @@ def main():
         st.markdown("### Select Countries for Analysis")
         available_countries = list(country_data.keys())
         
-        for country_code in available_countries:
-            country_info = COUNTRIES[country_code]
-            is_selected = country_code in st.session_state.selected_countries
-            
-            if st.checkbox(
-                f"{country_info['flag']} {country_info['name']}", 
-                value=is_selected,
-                key=f"country_{country_code}"
-            ):
-                if country_code not in st.session_state.selected_countries:
-                    st.session_state.selected_countries.append(country_code)
-            else:
-                if country_code in st.session_state.selected_countries:
-                    st.session_state.selected_countries.remove(country_code)
+        st.session_state.selected_countries = st.multiselect(
+            "Countries",
+            options=available_countries,
+            default=available_countries,
+            format_func=lambda x: f"{COUNTRIES[x]['flag']} {COUNTRIES[x]['name']}"
+        )
+        
+        # Per-country summary, computed once per data source in init_lookup_state
+        for country_code in st.session_state.selected_countries:
+            if country_code in st.session_state.overview_stats:
+                country_info = COUNTRIES[country_code]
+                overview = st.session_state.overview_stats[country_code]
+                st.markdown(
+                    f"{country_info['flag']} **{country_info['name']}**: "
+                    f"{overview['total_occupations']} occupations, "
+                    f"avg 2024 risk {overview['avg_automation_2024']:.3f}, "
+                    f"{overview['high_risk_percentage']:.1f}% high risk by 2050"
+                )
         
         st.markdown("---")
         
@@ -438,28 +685,43 @@ def main():
         
         for country_code in available_countries:
             country_info = COUNTRIES[country_code]
-            df = country_data[country_code]
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                csv_data, csv_name, csv_type = export_data(df, f"{country_info['name']}_automation", "csv")
-                st.download_button(
-                    label=f"📄 {country_info['flag']} CSV",
-                    data=csv_data,
-                    file_name=csv_name,
-                    mime=csv_type,
-                    key=f"csv_{country_code}"
-                )
+            # Export the values as parsed, not the float32 analysis copy
+            df = source_data[country_code]
             
-            with col2:
-                excel_data, excel_name, excel_type = export_data(df, f"{country_info['name']}_automation", "excel")
-                st.download_button(
-                    label=f"📊 {country_info['flag']} Excel",
-                    data=excel_data,
-                    file_name=excel_name,
-                    mime=excel_type,
-                    key=f"excel_{country_code}"
-                )
+            # Files are only serialized once the user asks for them
+            with st.expander(f"{country_info['flag']} {country_info['name']}"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("📄 Prepare CSV", key=f"prepare_csv_{country_code}"):
+                        st.session_state[f"export_csv_{country_code}"] = export_data(
+                            df, f"{country_info['name']}_automation", "csv"
+                        )
+                    
+                    if f"export_csv_{country_code}" in st.session_state:
+                        csv_data, csv_name, csv_type = st.session_state[f"export_csv_{country_code}"]
+                        st.download_button(
+                            label=f"📄 {country_info['flag']} CSV",
+                            data=csv_data,
+                            file_name=csv_name,
+                            mime=csv_type,
+                            key=f"csv_{country_code}"
+                        )
+                
+                with col2:
+                    if st.button("📊 Prepare Excel", key=f"prepare_excel_{country_code}"):
+                        st.session_state[f"export_excel_{country_code}"] = export_data(
+                            df, f"{country_info['name']}_automation", "excel"
+                        )
+                    
+                    if f"export_excel_{country_code}" in st.session_state:
+                        excel_data, excel_name, excel_type = st.session_state[f"export_excel_{country_code}"]
+                        st.download_button(
+                            label=f"📊 {country_info['flag']} Excel",
+                            data=excel_data,
+                            file_name=excel_name,
+                            mime=excel_type,
+                            key=f"excel_{country_code}"
+                        )
     
     # Main content tabs
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -474,18 +736,14 @@ def main():
         
         # Get common occupations across selected countries
         if st.session_state.selected_countries:
-            common_occupations = None
-            for country_code in st.session_state.selected_countries:
-                if country_code in country_data:
-                    country_occs = set(country_data[country_code].iloc[:, 1].tolist())
-                    if common_occupations is None:
-                        common_occupations = country_occs
-                    else:
-                        common_occupations = common_occupations.intersection(country_occs)
+            # Common titles and their lowercased twin, built once per country selection
+            common_key = tuple(st.session_state.selected_countries)
+            if common_key not in st.session_state.common_title_indexes:
+                common_index = pd.Index(common_titles(title_sets, st.session_state.selected_countries), dtype=object)
+                st.session_state.common_title_indexes[common_key] = (common_index, common_index.str.lower())
+            common_index, common_lower = st.session_state.common_title_indexes[common_key]
             
-            if common_occupations:
-                common_occupations = sorted(list(common_occupations))
-                
+            if len(common_index):
                 # Search functionality
                 search_term = st.text_input(
                     "🔍 Search for an occupation:",
@@ -495,12 +753,11 @@ def main():
                 
                 # Filter occupations based on search
                 if search_term:
-                    filtered_occs = [occ for occ in common_occupations 
-                                   if search_term.lower() in occ.lower()]
+                    filtered_occs = filter_occupation_titles(common_index, common_lower, search_term)
                     st.info(f"Found {len(filtered_occs)} matching occupations")
                 else:
-                    filtered_occs = common_occupations[:50]  # Show first 50
-                    st.info(f"Showing first 50 of {len(common_occupations)} common occupations")
+                    filtered_occs = common_index[:50].tolist()  # Show first 50
+                    st.info(f"Showing first 50 of {len(common_index)} common occupations")
                 
                 # Occupation selection
                 selected_occupation = st.selectbox(
@@ -511,7 +768,9 @@ def main():
                 
                 if selected_occupation:
                     # Calculate and display statistics
-                    stats = calculate_country_occupation_stats(selected_occupation, country_data)
+                    stats = calculate_country_occupation_stats(
+                        selected_occupation, prob_lookup, st.session_state.selected_countries
+                    )
                     
                     # Display basic metrics only - REMOVED complex statistics
                     st.markdown(f"### 📊 **{selected_occupation}** - Cross-Country Analysis")
@@ -538,30 +797,27 @@ def main():
                     # Create and display comparison plot
                     fig = create_country_comparison_plot(
                         selected_occupation, 
-                        country_data, 
+                        prob_lookup, 
                         st.session_state.selected_countries
                     )
                     
-                    if fig:
+                    if fig is not None:
                         st.plotly_chart(fig, use_container_width=True)
                     
                     # Simple risk assessment
                     st.markdown("### 🎯 Risk Assessment by Country")
                     
-                    risk_data = []
-                    for country_code in st.session_state.selected_countries:
-                        if country_code in stats:
-                            country_info = COUNTRIES[country_code]
-                            country_stats = stats[country_code]
-                            
-                            risk_level = "🔴 High" if country_stats['current_2024'] > 0.5 else \
-                                        "🟡 Medium" if country_stats['current_2024'] > 0.2 else "🟢 Low"
-                            
-                            risk_data.append({
-                                'Country': f"{country_info['flag']} {country_info['name']}",
-                                'Current Risk (2024)': f"{country_stats['current_2024']:.3f}",
-                                'Risk Level': risk_level
-                            })
+                    risk_codes = [code for code in st.session_state.selected_countries if code in stats]
+                    current = np.array([stats[code]['current_2024'] for code in risk_codes], dtype=np.float32)
+                    
+                    risk_data = [
+                        {
+                            'Country': f"{COUNTRIES[code]['flag']} {COUNTRIES[code]['name']}",
+                            'Current Risk (2024)': f"{prob:.3f}",
+                            'Risk Level': risk_level
+                        }
+                        for code, prob, risk_level in zip(risk_codes, current, classify_risk(current))
+                    ]
                     
                     if risk_data:
                         risk_df = pd.DataFrame(risk_data)
@@ -574,15 +830,14 @@ def main():
     with tab2:
         st.markdown('<h2 class="sub-header">📊 Multi-Occupation Analysis by Country</h2>', unsafe_allow_html=True)
         
-        # Country selection for multi-occupation analysis
-        analysis_country = st.selectbox(
-            "Select a country for multi-occupation analysis:",
-            options=list(country_data.keys()),
-            format_func=lambda x: f"{COUNTRIES[x]['flag']} {COUNTRIES[x]['name']}"
-        )
-        
-        if analysis_country:
-            df = country_data[analysis_country]
+        # Widgets inside a form only trigger a rerun when the form is submitted
+        with st.form("multi_analysis_form"):
+            # Country selection for multi-occupation analysis
+            analysis_country = st.selectbox(
+                "Select a country for multi-occupation analysis:",
+                options=list(country_data.keys()),
+                format_func=lambda x: f"{COUNTRIES[x]['flag']} {COUNTRIES[x]['name']}"
+            )
             
             # Occupation search and selection
             search_multi = st.text_input(
@@ -591,58 +846,72 @@ def main():
                 key="multi_search"
             )
             
-            available_occupations = df.iloc[:, 1].tolist()
-            
-            if search_multi:
-                filtered_multi = [occ for occ in available_occupations 
-                                if search_multi.lower() in occ.lower()]
+            if analysis_country:
+                filtered_multi = filter_occupation_titles(
+                    *st.session_state.title_indexes[analysis_country], search_multi
+                )
             else:
-                filtered_multi = available_occupations
+                filtered_multi = []
             
             # Multi-select for occupations
             selected_multi_occupations = st.multiselect(
                 "Select occupations to compare:",
                 options=filtered_multi,
                 default=filtered_multi[:3] if len(filtered_multi) >= 3 else filtered_multi,
-                help="You can select multiple occupations to compare"
+                help="Search, pick occupations, then press Update to refresh the analysis"
             )
             
-            if selected_multi_occupations:
+            submitted = st.form_submit_button("Update")
+        
+        # Plot and table are rebuilt on submit only, other reruns reuse the last result
+        if submitted or 'multi_analysis' not in st.session_state:
+            multi_analysis = {'fig': None, 'table': None}
+            
+            if analysis_country and selected_multi_occupations:
                 # Create multi-occupation plot
-                fig = create_multi_occupation_plot(
+                multi_analysis['fig'] = create_multi_occupation_plot(
                     selected_multi_occupations, 
                     analysis_country, 
-                    country_data
+                    prob_lookup
                 )
                 
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True)
-                
-                # Comparison table
-                st.markdown("### 📋 Occupation Comparison Table")
+                found_occupations, probs = lookup_occupations(
+                    prob_lookup, analysis_country, selected_multi_occupations
+                )
                 
-                comparison_data = []
-                for occ in selected_multi_occupations:
-                    occ_row = df[df.iloc[:, 1] == occ]
-                    if not occ_row.empty:
-                        probs = occ_row.iloc[0, 2:].values
-                        
-                        current_2024 = probs[7] if len(probs) > 7 else 0
-                        outlook_2030 = probs[13] if len(probs) > 13 else 0
-                        midterm_2050 = probs[33] if len(probs) > 33 else 0
-                        
-                        comparison_data.append({
+                if found_occupations:
+                    # Years past the end of the tensor fall back to 0, as in the per-occupation stats
+                    n_years = prob_lookup['probs'].shape[2]
+                    current, outlook, midterm = (
+                        probs[:, year_idx] if year_idx < n_years else np.zeros(len(found_occupations), dtype=probs.dtype)
+                        for year_idx in (IDX_2024, IDX_2030, IDX_2050)
+                    )
+                    
+                    multi_analysis['table'] = pd.DataFrame([
+                        {
                             'Occupation': occ,
                             'Current 2024': f"{current_2024:.4f}",
                             '2030 Outlook': f"{outlook_2030:.4f}",
                             '2050 Projection': f"{midterm_2050:.4f}",
-                            'Risk Level': "🔴 High" if current_2024 > 0.5 else 
-                                        "🟡 Medium" if current_2024 > 0.2 else "🟢 Low"
-                        })
-                
-                if comparison_data:
-                    comparison_df = pd.DataFrame(comparison_data)
-                    st.dataframe(comparison_df, use_container_width=True)
+                            'Risk Level': risk_level
+                        }
+                        for occ, current_2024, outlook_2030, midterm_2050, risk_level in zip(
+                            found_occupations, current, outlook, midterm,
+                            classify_risk(current)
+                        )
+                    ])
+            
+            st.session_state.multi_analysis = multi_analysis
+        
+        multi_analysis = st.session_state.multi_analysis
+        
+        if multi_analysis['fig'] is not None:
+            st.plotly_chart(multi_analysis['fig'], use_container_width=True)
+        
+        if multi_analysis['table'] is not None:
+            # Comparison table
+            st.markdown("### 📋 Occupation Comparison Table")
+            st.dataframe(multi_analysis['table'], use_container_width=True)
     
     with tab3:
         st.markdown('<h2 class="sub-header">📋 Browse All Occupations</h2>', unsafe_allow_html=True)
@@ -666,89 +935,83 @@ def main():
             )
             
             if browse_filter:
-                filtered_browse = search_occupations(df, browse_filter)
+                filtered_browse = search_occupations(
+                    df, browse_filter, st.session_state.search_columns[browse_country]
+                )
                 st.info(f"Showing {len(filtered_browse)} filtered occupations")
             else:
                 filtered_browse = df
                 st.info(f"Showing all {len(filtered_browse)} occupations")
             
-            # Display occupations
-            for idx, (_, row) in enumerate(filtered_browse.iterrows()):
-                occ_title = row.iloc[1]
-                soc_code = row.iloc[0]
-                
-                # Calculate quick stats
-                probs = row.iloc[2:].values
-                current_2024 = probs[7] if len(probs) > 7 else 0
-                prob_2050 = probs[33] if len(probs) > 33 else 0
-                
-                risk_level = "🔴 High Risk" if current_2024 > 0.5 else \
-                           "🟡 Medium Risk" if current_2024 > 0.2 else "🟢 Low Risk"
-                
-                col1, col2, col3 = st.columns([3, 1, 1])
+            # Quick stats for the displayed fields only, computed column-wise; files that stop
+            # before a year show 0 for it, like the per-occupation stats
+            def year_column(year_idx: int) -> np.ndarray:
+                if filtered_browse.shape[1] > PROB_START_COL + year_idx:
+                    return filtered_browse.iloc[:, PROB_START_COL + year_idx].to_numpy(dtype=np.float32)
+                return np.zeros(len(filtered_browse), dtype=np.float32)
+            
+            display_df = pd.DataFrame({
+                'Selected': filtered_browse.iloc[:, 1].isin(st.session_state.selected_occupations).to_numpy(),
+                'SOC Code': filtered_browse.iloc[:, 0].astype(str).to_numpy(),
+                'Title': filtered_browse.iloc[:, 1].astype(str).to_numpy(),
+                '2024 Risk': year_column(IDX_2024),
+                '2050': year_column(IDX_2050),
+            })
+            display_df['Risk Level'] = classify_risk(display_df['2024 Risk'].to_numpy(), suffix=" Risk")
+            
+            # One grid widget instead of a card and buttons per occupation; the key includes the
+            # filter so pending edits are never applied to rows of a different result set
+            edited_df = st.data_editor(
+                display_df,
+                disabled=['SOC Code', 'Title', '2024 Risk', '2050', 'Risk Level'],
+                column_config={
+                    'Selected': st.column_config.CheckboxColumn(help="Add to your comparison list"),
+                    '2024 Risk': st.column_config.NumberColumn(format="%.4f"),
+                    '2050': st.column_config.NumberColumn(format="%.4f"),
+                },
+                hide_index=True,
+                use_container_width=True,
+                key=f"browse_editor_{browse_country}_{browse_filter}"
+            )
+            
+            # Sync checkbox changes back to the comparison list
+            added = edited_df.loc[edited_df['Selected'] & ~display_df['Selected'], 'Title']
+            removed = edited_df.loc[~edited_df['Selected'] & display_df['Selected'], 'Title']
+            for occ_title in added:
+                st.session_state.selected_occupations.append(occ_title)
+            for occ_title in removed:
+                st.session_state.selected_occupations.remove(occ_title)
+            
+            occ_title = st.selectbox(
+                "📊 Select an occupation for detailed analysis:",
+                options=display_df['Title'].tolist(),
+                index=None,
+                key="browse_analyze"
+            )
+            
+            if occ_title:
+                # Create single occupation analysis
+                stats = calculate_country_occupation_stats(occ_title, prob_lookup, [browse_country])
                 
-                with col1:
-                    is_selected = occ_title in st.session_state.selected_occupations
+                if browse_country in stats:
+                    st.markdown(f"### 🔍 **{occ_title}** Analysis")
                     
-                    st.markdown(f"""
-                    <div class="occupation-card {'selected-occupation' if is_selected else ''}">
-                        <strong>SOC Code:</strong> {soc_code}<br>
-                        <strong>Title:</strong> {occ_title}<br>
-                        <strong>2024 Risk:</strong> {current_2024:.4f} | <strong>2050:</strong> {prob_2050:.4f}<br>
-                        <strong>Risk Level:</strong> {risk_level}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    if is_selected:
-                        if st.button("Remove", key=f"browse_remove_{idx}", type="secondary"):
-                            st.session_state.selected_occupations.remove(occ_title)
-                            st.rerun()
-                    else:
-                        if st.button("Add", key=f"browse_add_{idx}", type="primary"):
-                            st.session_state.selected_occupations.append(occ_title)
-                            st.rerun()
-                
-                with col3:
-                    if st.button("📊 Analyze", key=f"browse_analyze_{idx}", help="Detailed analysis"):
-                        # Create single occupation analysis
-                        stats = calculate_country_occupation_stats(occ_title, {browse_country: df})
-                        
-                        if browse_country in stats:
-                            st.markdown(f"### 🔍 **{occ_title}** Analysis")
-                            
-                            country_info = COUNTRIES[browse_country]
-                            country_stats = stats[browse_country]
-                            
-                            # Display metrics
-                            metric_cols = st.columns(3)
-                            with metric_cols[0]:
-                                st.metric("🎯 Current (2024)", f"{country_stats['current_2024']:.4f}")
-                            with metric_cols[1]:
-                                st.metric("📅 2030 Outlook", f"{country_stats['outlook_2030']:.4f}")
-                            with metric_cols[2]:
-                                st.metric("🔮 2050 Projection", f"{country_stats['midterm_2050']:.4f}")
-                            
-                            # Create individual plot
-                            fig = go.Figure()
-                            fig.add_trace(go.Scatter(
-                                x=country_stats['years'],
-                                y=country_stats['probabilities'],
-                                mode='lines+markers',
-                                name=f"{country_info['flag']} {country_info['name']}",
-                                line=dict(color=country_info['color'], width=4),
-                                marker=dict(size=8),
-                                fill='tonexty'
-                            ))
-                            
-                            fig.update_layout(
-                                title=f"Automation Probability: {occ_title}",
-                                xaxis_title="Year",
-                                yaxis_title="Automation Probability",
-                                height=400
-                            )
-                            
-                            st.plotly_chart(fig, use_container_width=True)
+                    country_stats = stats[browse_country]
+                    
+                    # Display metrics
+                    metric_cols = st.columns(3)
+                    with metric_cols[0]:
+                        st.metric("🎯 Current (2024)", f"{country_stats['current_2024']:.4f}")
+                    with metric_cols[1]:
+                        st.metric("📅 2030 Outlook", f"{country_stats['outlook_2030']:.4f}")
+                    with metric_cols[2]:
+                        st.metric("🔮 2050 Projection", f"{country_stats['midterm_2050']:.4f}")
+                    
+                    # Create individual plot
+                    fig = create_single_occupation_plot(occ_title, browse_country, prob_lookup)
+                    
+                    if fig is not None:
+                        st.plotly_chart(fig, use_container_width=True)
     
     with tab4:
         st.markdown('<h2 class="sub-header">📈 Country Automation Rankings</h2>', unsafe_allow_html=True)
@@ -760,15 +1023,15 @@ def main():
             index=0
         )
         
-        year_index = ranking_year - 2017
+        year_index = ranking_year - YEARS[0]
         
         # Calculate country averages
         country_averages = {}
         occupation_counts = {}
         
         for country_code, df in country_data.items():
-            if len(df.columns) > year_index + 2:  # +2 for SOC and Title columns
-                avg_prob = df.iloc[:, year_index + 2].mean()
+            if len(df.columns) > PROB_START_COL + year_index:
+                avg_prob = df.iloc[:, PROB_START_COL + year_index].mean()
                 country_averages[country_code] = avg_prob
                 occupation_counts[country_code] = len(df)
         
@@ -844,9 +1107,9 @@ def main():
         if analysis_country_rank:
             df_rank = country_data[analysis_country_rank]
             
-            if len(df_rank.columns) > year_index + 2:
+            if len(df_rank.columns) > PROB_START_COL + year_index:
                 # Get probabilities for selected year
-                year_probs = df_rank.iloc[:, [1, year_index + 2]].copy()  # Title and year probability
+                year_probs = df_rank.iloc[:, [1, PROB_START_COL + year_index]].copy()  # Title and year probability
                 year_probs.columns = ['Occupation', 'Probability']
                 year_probs = year_probs.sort_values('Probability', ascending=False)
                 
@@ -873,18 +1136,12 @@ def main():
         
         if len(country_data) >= 2:
             # Find common occupations
-            common_occs = None
-            for country_code, df in country_data.items():
-                country_occs = set(df.iloc[:, 1].tolist())
-                if common_occs is None:
-                    common_occs = country_occs
-                else:
-                    common_occs = common_occs.intersection(country_occs)
+            common_occs = common_titles(title_sets, list(country_data.keys()))
             
-            if common_occs and len(common_occs) > 0:
+            if common_occs:
                 comparison_occ = st.selectbox(
                     "Select occupation for cross-country comparison:",
-                    options=sorted(list(common_occs)),
+                    options=common_occs,
                     key="cross_country_occ"
                 )
                 
@@ -892,10 +1149,11 @@ def main():
                     # Get probabilities for this occupation across countries
                     cross_country_data = []
                     
-                    for country_code, df in country_data.items():
-                        occ_row = df[df.iloc[:, 1] == comparison_occ]
-                        if not occ_row.empty and len(occ_row.iloc[0]) > year_index + 2:
-                            prob = occ_row.iloc[0, year_index + 2]
+                    row = prob_lookup['title_to_row'][comparison_occ]
+                    
+                    for i, country_code in enumerate(prob_lookup['codes']):
+                        if prob_lookup['present'][i, row] and year_index < prob_lookup['probs'].shape[2]:
+                            prob = float(prob_lookup['probs'][i, row, year_index])
                             country_info = COUNTRIES[country_code]
                             
                             cross_country_data.append({